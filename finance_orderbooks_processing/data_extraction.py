@@ -1,14 +1,23 @@
 import os
 import re
+import csv
+import math
+import functools
 from typing import List
 import pandas as pd
 import numpy as np
-import openpyxl
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from python_calamine import CalamineWorkbook, SheetVisibleEnum
+import pyarrow as pa
+from pyarrow import csv as pa_csv
 
 # ========== USER CONFIG ==========
 INPUT_DIR = "data"   # folder with your Excel files
-VALID_EXTS = {".xlsx", ".xlsm", ".xls"}  # add .xlsb if needed (requires pyxlsb)
+VALID_EXTS = {".xlsx", ".xlsm", ".xls"}  # add .xlsb if needed; add .csv for CSV exports
 SCAN_ROWS = 20  # how many rows to search for header
+SHEET_WORKERS = 4  # sheets read concurrently per workbook
 TARGET_COLUMNS = [
         'JobNumber', 'Office', 'Office (Div)', 'ProjectTitle', 'Client', 
         'Location (Country)', 'Gross Fee (USD)', 'Fee Earned (USD)', 
@@ -22,8 +31,18 @@ COLUMN_ALIASES = {
     'NewProject': ['NewProject', 'New Project', 'New_Project', 'IsNew', 'Is New'],
 }
 
+# Frames share one schema (reindexed to TARGET_COLUMNS), so concat needn't copy.
+# pandas >= 3 is copy-on-write and deprecates the copy keyword.
+CONCAT_KWARGS = {"sort": False} if int(pd.__version__.split(".")[0]) >= 3 else {"sort": False, "copy": False}
 
-def normalize(name: str) -> str:
+_RE_SEP = re.compile(r"[\s_\-]+")
+_RE_PUNCT = re.compile(r"[^\w]")
+_RE_PAREN = re.compile(r"\(([\d\.,]+)\)")
+_RE_NONNUM = re.compile(r"[^\d\.\-]")
+
+
+@functools.lru_cache(maxsize=4096, typed=True)
+def normalize(name) -> str:
     """
     Normalize column names so:
     - 'Project Title' -> 'projecttitle'
@@ -31,56 +50,141 @@ def normalize(name: str) -> str:
     - 'Project_Type'  -> 'projecttype'
     - 'Client'        -> 'client'
     - 'Gross Fee Yet To Be Earned (USD)' -> 'grossfeeyettobeearnedusd'
+    Any cell value is accepted: None/NaN -> '', other non-strings via str().
     """
-    if name is None or type(name) is not str:
+    if name is None:
+        return ""
+    if isinstance(name, float) and math.isnan(name):
         return ""
+    if not isinstance(name, str):
+        name = str(name)
     s = name.strip().lower()
-    s = re.sub(r"[\s_\-]+", "", s)     # remove spaces/underscores/dashes
-    s = re.sub(r"[^\w]", "", s)        # remove other punctuation
+    s = _RE_SEP.sub("", s)     # remove spaces/underscores/dashes
+    s = _RE_PUNCT.sub("", s)   # remove other punctuation
     return s
 
+# Normalized names to look for per target column (its aliases, or itself)
+_TARGETS_NORMALIZED = {
+    target: [normalize(n) for n in COLUMN_ALIASES.get(target, [target])]
+    for target in TARGET_COLUMNS
+}
+
 def find_header_row(df_no_header):
     """
     Return the earliest (0-based) row index where BOTH 'Client' and 'Currency' appear.
     Case-insensitive; whitespace/punct ignored.
     """
-    import builtins
-    max_r = min(len(df_no_header), SCAN_ROWS)
-    for r in range(max_r):
-        row = [normalize(v) for v in df_no_header.iloc[r].tolist()]
-        if "jobnumber" in row and "currency" in row:
-            return r
-    return None  # not found
+    top = df_no_header.head(SCAN_ROWS)
+    # Title/logo rows are mostly empty; only normalize rows with 2+ filled cells
+    candidates = np.flatnonzero((top.notna().sum(axis=1) >= 2).values)
+    if not candidates.size:
+        return None
+    block = top.iloc[candidates]
+    # DataFrame.map is pandas >= 2.1; older runtimes only have applymap
+    block = (block.map if hasattr(block, "map") else block.applymap)(normalize).values
+    has_job = (block == "jobnumber").any(axis=1)
+    has_cur = (block == "currency").any(axis=1)
+    idx = candidates[has_job & has_cur]
+    return int(idx[0]) if idx.size else None  # None if not found
 
 def _to_number(series: pd.Series) -> pd.Series:
     # Keep digits, sign, and decimal; turn "(123)" into "-123"
-    s = series.astype(str).fillna("")
-    s = s.str.replace(r"\(([\d\.,]+)\)", r"-\1", regex=True)
-    s = s.str.replace(r"[^\d\.\-]", "", regex=True)
-    return pd.to_numeric(s, errors="coerce")
+    # Arrow-backed strings keep both replaces in pyarrow's C++ regex kernels;
+    # pass the pattern text, a compiled re.Pattern drops back to Python.
+    s = series.astype("string[pyarrow]").fillna("")
+    s = s.str.replace(_RE_PAREN.pattern, r"-\1", regex=True)
+    s = s.str.replace(_RE_NONNUM.pattern, "", regex=True)
+    # Plain float64 (NaN, not pd.NA) for the Spark conversion and DECIMAL(18,2) cast
+    return pd.to_numeric(s, errors="coerce").astype("float64")
 
-def read_sheet(path, sheet):
-    raw = pd.read_excel(path, sheet_name=sheet, header=None, dtype=str, engine=None)
+def _cell_value(v):
+    """
+    Convert a calamine cell to what pd.read_excel would have produced:
+    empty cells -> NaN, whole floats -> int, bare dates -> Timestamp.
+    """
+    if v == "":
+        return np.nan
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, date) and not isinstance(v, datetime):
+        return pd.Timestamp(v)
+    return v
+
+def read_sheet(wb, sheet):
     print(f"Processing sheet : {sheet}")
-    if raw.empty:
+    rows = wb.get_sheet_by_name(sheet).iter_rows()
+
+    # Only the top SCAN_ROWS are needed to locate the header
+    top = [[_cell_value(v) for v in row] for row in islice(rows, SCAN_ROWS)]
+    if not top:
         return pd.DataFrame()
 
-    hdr = find_header_row(raw)
+    hdr = find_header_row(pd.DataFrame(top, dtype=object))
     if hdr is None:
         print(f"no headers found for {sheet} - skipping..")
         return pd.DataFrame()
 
-    cols = raw.iloc[hdr].tolist()
+    cleaned_cols = _clean_columns(top[hdr])
     
-    # Clean up column names
+    # Stream the remaining rows straight into the data frame
+    body = top[hdr+1:]
+    body.extend([_cell_value(v) for v in row] for row in rows)
+    data = pd.DataFrame(body, columns=cleaned_cols, dtype=object)
+    return _select_target_columns(data, sheet)
+
+
+def read_csv_sheet(path):
+    """
+    Read a CSV export of a sheet with pyarrow's multithreaded reader.
+    Header detection and column mapping are the same as for Excel sheets.
+    """
+    print(f"Processing csv : {path}")
+    try:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=8 << 20,
+                                            autogenerate_column_names=True),
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True),
+        )
+        raw = table.to_pandas()
+    except pa.ArrowInvalid as e:
+        # pyarrow needs every row to have the same number of fields; title
+        # rows above the header are often shorter ("Order Book\nJob Number,...")
+        print(f"Ragged rows ({e}), re-reading with padded columns")
+        raw = _read_ragged_csv(path)
+    # Missing cells as NaN, like empty Excel cells
+    raw = raw.astype(object).where(raw.notna(), np.nan)
+    if raw.empty:
+        return pd.DataFrame()
+
+    hdr = find_header_row(raw)
+    if hdr is None:
+        print(f"no headers found for {path} - skipping..")
+        return pd.DataFrame()
+
+    data = raw.iloc[hdr+1:].reset_index(drop=True)
+    data.columns = _clean_columns(raw.iloc[hdr].tolist())
+    return _select_target_columns(data, os.path.basename(path))
+
+
+def _read_ragged_csv(path):
+    """Read a CSV whose rows differ in length, padding short rows with NaN."""
+    with open(path, newline='', encoding='utf-8') as f:
+        width = max((len(row) for row in csv.reader(f)), default=0)
+    if width == 0:
+        return pd.DataFrame()
+    return pd.read_csv(path, header=None, names=range(width), dtype=object,
+                       keep_default_na=False, na_values=[""], encoding='utf-8')
+
+
+def _clean_columns(cols):
+    """Header cells -> unique, non-empty column names."""
     cleaned_cols = []
     seen_cols = {}
     
     for i, col in enumerate(cols):
-        if col is None or (isinstance(col, float) and pd.isna(col)) or str(col).strip() == '':
-            clean_col = f"unnamed_col_{i}"
-        else:
-            clean_col = str(col).strip()
+        # normalize() is '' for None/NaN/blank cells
+        clean_col = str(col).strip() if normalize(col) else f"unnamed_col_{i}"
         
         if clean_col in seen_cols:
             seen_cols[clean_col] += 1
@@ -89,36 +193,29 @@ def read_sheet(path, sheet):
             seen_cols[clean_col] = 0
         
         cleaned_cols.append(clean_col)
-    
-    data = raw.iloc[hdr+1:].reset_index(drop=True)
-    data.columns = cleaned_cols
-    
+    return cleaned_cols
+
+
+def _select_target_columns(data, sheet):
+    """Map a sheet's columns onto TARGET_COLUMNS and clean the numeric ones."""
+    cleaned_cols = list(data.columns)
     print(f"Columns in sheet {sheet} : {cleaned_cols}")
     
     # Create normalized mapping: normalized name -> actual column name
-    normalized_map = {}
-    for actual_col in data.columns:
-        normalized_map[normalize(actual_col)] = actual_col
+    normalized_map = {normalize(c): c for c in data.columns}
     
-    out = pd.DataFrame()
+    matched = {}
     
     # Map each target column, checking aliases
     for target_col in TARGET_COLUMNS:
         found = False
         matched_col = None
         
-        # Check if this column has aliases
-        if target_col in COLUMN_ALIASES:
-            possible_names = COLUMN_ALIASES[target_col]
-        else:
-            possible_names = [target_col]
-        
-        # Try to find any of the possible names
-        for possible_name in possible_names:
-            normalized_possible = normalize(possible_name)
+        # Try to find any of the possible names (aliases pre-normalized at import)
+        for normalized_possible in _TARGETS_NORMALIZED[target_col]:
             if normalized_possible in normalized_map:
                 actual_col = normalized_map[normalized_possible]
-                out[target_col] = data[actual_col]
+                matched[target_col] = data[actual_col]
                 matched_col = actual_col
                 found = True
                 break
@@ -126,10 +223,11 @@ def read_sheet(path, sheet):
         if found:
             print(f"✓ Found: {target_col} (mapped from '{matched_col}')")
         else:
+            possible_names = COLUMN_ALIASES.get(target_col, [target_col])
             print(f"✗ Missing: {target_col} (tried: {', '.join(possible_names)})")
     
-    # Ensure the DataFrame has ONLY the target columns in the exact order
-    out = out.reindex(columns=TARGET_COLUMNS)
+    # Build once, with ONLY the target columns in the exact order
+    out = pd.DataFrame(matched).reindex(columns=TARGET_COLUMNS)
     
     if out.empty:
         print(f"No valid data found in {sheet}")
@@ -153,7 +251,7 @@ def read_sheet(path, sheet):
 
 
 def read_file(path):
-    """Read all sheets from an Excel file."""
+    """Read all sheets from an Excel file (or a single-sheet CSV export)."""
     # Convert volume path to proper format for pandas
     if path.startswith('/Volumes/'):
         # Volume paths are already accessible as local filesystem paths
@@ -166,39 +264,51 @@ def read_file(path):
     
     print(f"Attempting to read from: {local_path}")
     
+    if local_path.lower().endswith('.csv'):
+        try:
+            df = read_csv_sheet(local_path)
+        except Exception as e:
+            print(f"Could not read file: {e}")
+            print(f"Path attempted: {local_path}")
+            return pd.DataFrame(columns=TARGET_COLUMNS)
+        return df if not df.empty else pd.DataFrame(columns=TARGET_COLUMNS)
+    
     try:
-        xl = pd.ExcelFile(local_path, engine='openpyxl')
+        wb = CalamineWorkbook.from_path(local_path)
     except Exception as e:
         print(f"Could not read file: {e}")
         print(f"Path attempted: {local_path}")
         return pd.DataFrame(columns=TARGET_COLUMNS)
     
-    wb = openpyxl.load_workbook(local_path, read_only=True, data_only=True)
-    
-    # Filter out hidden sheets
+    # Filter out hidden sheets ('hidden' or 'veryHidden')
     visible_sheets = []
-    for sheet_name in xl.sheet_names:
-        sheet = wb[sheet_name]
-        # sheet.sheet_state can be 'visible', 'hidden', or 'veryHidden'
-        if sheet.sheet_state == 'visible':
-            visible_sheets.append(sheet_name)
+    for sheet in wb.sheets_metadata:
+        if sheet.visible == SheetVisibleEnum.Visible:
+            visible_sheets.append(sheet.name)
         else:
-            print(f"Skipping hidden sheet: {sheet_name}")
-    
+            print(f"Skipping hidden sheet: {sheet.name}")
+
     wb.close()
 
-    frames = []
-    for s in visible_sheets:
+    def read_visible_sheet(s):
+        # A CalamineWorkbook can't be borrowed by two threads at once
+        # ("Already borrowed"), so each sheet gets its own handle.
+        sheet_wb = None
         try:
-            df = read_sheet(local_path, s)
-            if not df.empty:
-                frames.append(df)
+            sheet_wb = CalamineWorkbook.from_path(local_path)
+            return read_sheet(sheet_wb, s)
         except Exception as e:
             print(f"Error reading sheet {s}: {e}")
-            continue
+            return pd.DataFrame()
+        finally:
+            if sheet_wb is not None:
+                sheet_wb.close()
+
+    with ThreadPoolExecutor(max_workers=SHEET_WORKERS) as ex:
+        frames = [df for df in ex.map(read_visible_sheet, visible_sheets) if not df.empty]
     
     if not frames:
         return pd.DataFrame(columns=TARGET_COLUMNS)
     
-    return pd.concat(frames, ignore_index=True)
+    return pd.concat(frames, ignore_index=True, **CONCAT_KWARGS)
 
@@ -1,9 +1,43 @@
+import os
 import re
+import glob
+import functools
 import hashlib
+import xxhash
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from datetime import datetime  # If you're working with datetime objects
-from data_extraction import read_file
+from data_extraction import read_file, TARGET_COLUMNS, COLUMN_ALIASES, CONCAT_KWARGS
 
+# Per-file extraction cache, keyed by path + mtime + version. Only the newest
+# entry per source path is kept; delete the folder to clear it entirely.
+CACHE_DIR = ".cache"
+# Bump whenever extraction/cleaning/hashing output changes, to invalidate the cache
+CACHE_VERSION = 2
+# Low-cardinality text columns, stored as pandas categoricals
+CATEGORY_COLUMNS = [
+    'Office', 'Office (Div)', 'Currency', 'Status', 'ProjectType',
+    'Location (Country)', 'NewProject'
+]
+
+_MONTHS = {
+    'jan': (1, 'Jan'), 'feb': (2, 'Feb'), 'mar': (3, 'Mar'), 'apr': (4, 'Apr'),
+    'may': (5, 'May'), 'jun': (6, 'Jun'), 'jul': (7, 'Jul'), 'aug': (8, 'Aug'),
+    'sep': (9, 'Sep'), 'oct': (10, 'Oct'), 'nov': (11, 'Nov'), 'dec': (12, 'Dec')
+}
+_MONTH_NAMES = (r'(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?'
+                r'|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)')
+# A month directly followed by the year, e.g. "Mar_2025", "(Jun 2025)", "BookMar2025".
+# Requiring the year right after already rules out "Summary"/"Separate"/"Primary".
+_MONTH_YEAR_RE = re.compile(_MONTH_NAMES + r'[^a-z0-9]*(20\d{2})', re.I)
+# Fallback without a year: whole month words only, so "Summary" isn't read as Mar
+_MONTH_RE = re.compile(r'(?<![a-z])' + _MONTH_NAMES + r'(?![a-z])', re.I)
+_YEAR_RE = re.compile(r'20\d{2}')
+
+@functools.lru_cache(maxsize=256)
 def extract_date_from_filename(filename):
     """
     Extract year, month name, and month number from filename.
@@ -11,50 +45,97 @@ def extract_date_from_filename(filename):
       "1_Order_Book_Mar_2025.xlsx" -> (2025, "Mar", 3)
       "1. Order Book (Jun 2025).xlsm" -> (2025, "Jun", 6)
     """
-    month_map = {
-        'jan': (1, 'Jan'), 'january': (1, 'Jan'),
-        'feb': (2, 'Feb'), 'february': (2, 'Feb'),
-        'mar': (3, 'Mar'), 'march': (3, 'Mar'),
-        'apr': (4, 'Apr'), 'april': (4, 'Apr'),
-        'may': (5, 'May'),
-        'jun': (6, 'Jun'), 'june': (6, 'Jun'),
-        'jul': (7, 'Jul'), 'july': (7, 'Jul'),
-        'aug': (8, 'Aug'), 'august': (8, 'Aug'),
-        'sep': (9, 'Sep'), 'sept': (9, 'Sep'), 'september': (9, 'Sep'),
-        'oct': (10, 'Oct'), 'october': (10, 'Oct'),
-        'nov': (11, 'Nov'), 'november': (11, 'Nov'),
-        'dec': (12, 'Dec'), 'december': (12, 'Dec')
-    }
+    month_year = _MONTH_YEAR_RE.search(filename)
+    if month_year:
+        month_num, month_name = _MONTHS[month_year.group(1)[:3].lower()]
+        return int(month_year.group(2)), month_name, month_num
     
-    # Extract year (4 digits)
-    year_match = re.search(r'20\d{2}', filename)
+    # Otherwise take the year (4 digits) and month separately
+    year_match = _YEAR_RE.search(filename)
     year = int(year_match.group()) if year_match else None
     
-    # Extract month
-    month_num = None
-    month_name = None
-    
-    filename_lower = filename.lower()
-    for month_key, (num, name) in month_map.items():
-        if month_key in filename_lower:
-            month_num = num
-            month_name = name
-            break
+    month_match = _MONTH_RE.search(filename)
+    month_num, month_name = _MONTHS[month_match.group(1)[:3].lower()] if month_match else (None, None)
     
     return year, month_name, month_num
 
+HASH_KEY_FIELDS = ['JobNumber', 'ProjectTitle', 'Client', 'Office', 'source_file']
+
 def calculate_row_hash(row_dict):
     """
     Calculate a hash for deduplication based on key fields.
     """
-    key_fields = ['JobNumber', 'ProjectTitle', 'Client', 'Office', 'source_file']
-    hash_string = '|'.join([str(row_dict.get(f, '')) for f in key_fields])
-    return hashlib.md5(hash_string.encode()).hexdigest()
+    hash_string = '|'.join([str(row_dict.get(f, '')) for f in HASH_KEY_FIELDS])
+    return xxhash.xxh3_128_hexdigest(hash_string.encode())
+
+def calculate_row_hashes(df):
+    """
+    Vectorized calculate_row_hash over a whole DataFrame.
+    Key fields are joined column-wise in Arrow, so only the hash call runs per row,
+    reading each key straight out of the joined UTF-8 buffer by its offsets.
+    """
+    parts = [pa.array(df[f].map(str), type=pa.string()) if f in df.columns else ''
+             for f in HASH_KEY_FIELDS]
+    joined = pc.binary_join_element_wise(*parts, '|')
+    _, offsets_buf, data_buf = joined.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int32)[joined.offset:joined.offset + len(joined) + 1].tolist()
+    data = memoryview(data_buf) if data_buf is not None else memoryview(b'')
+    return [xxhash.xxh3_128_hexdigest(data[start:end]) for start, end in zip(offsets, offsets[1:])]
+
+
+def _cache_path(file_info):
+    """
+    Parquet cache location for a file: <path key>_<version key>.parquet.
+    The version key changes whenever the file's mtime, CACHE_VERSION or the
+    column/hash configuration does; the path key lets stale entries be pruned.
+    """
+    path_key = hashlib.sha1(file_info['path'].encode()).hexdigest()
+    schema = repr((CACHE_VERSION, TARGET_COLUMNS, COLUMN_ALIASES, HASH_KEY_FIELDS, CATEGORY_COLUMNS))
+    version_key = hashlib.sha1(f"{file_info['mtime'].timestamp()}:{schema}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{path_key}_{version_key}.parquet")
+
+def _set_output_dtypes(df):
+    """
+    Give a processed frame the same dtypes whether it was just extracted or
+    read back from the Parquet cache. Cells keep their native types, so a text
+    column can mix e.g. ints and strings, which Parquet can't store: text
+    columns become str values (NaN for missing) in object dtype, low-cardinality
+    ones categoricals. Parquet would otherwise hand them back as str dtype, and
+    an all-NaN categorical as float64.
+    """
+    for col in TARGET_COLUMNS:
+        if pd.api.types.is_float_dtype(df[col]) and col not in CATEGORY_COLUMNS:
+            continue  # cleaned numeric (or entirely empty) column
+        values = df[col].astype(object)
+        values = values.map(str).where(values.notna(), np.nan)
+        # map(str) infers str dtype on pandas >= 3, so force object explicitly
+        df[col] = values.astype('category') if col in CATEGORY_COLUMNS else values.astype(object)
+    return df
+
+def _write_cache(df, cache_path):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        df.to_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"⚠ Could not cache {cache_path}: {e}")
+        return
+    
+    # Drop entries for the same source file left by older mtimes/versions
+    path_key = os.path.basename(cache_path).split('_')[0]
+    for old_path in glob.glob(os.path.join(CACHE_DIR, f"{path_key}_*.parquet")):
+        if old_path != cache_path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
 
 
 def process_excel_file(file_info):
     """
     Process a single Excel file using data_extraction.py module.
+    Results are cached as Parquet under CACHE_DIR until the file's mtime changes.
     """
     file_path = file_info['path']
     file_name = file_info['name']
@@ -64,6 +145,15 @@ def process_excel_file(file_info):
         print(f"Processing: {file_name}")
         print(f"{'='*70}")
         
+        cache_path = _cache_path(file_info)
+        if os.path.exists(cache_path):
+            try:
+                cached = _set_output_dtypes(pd.read_parquet(cache_path))
+                print(f"✓ Unchanged since last run, loaded {cache_path}")
+                return cached
+            except Exception as e:
+                print(f"⚠ Unreadable cache {cache_path}, re-extracting: {e}")
+        
         # Convert volume path to local path for pandas
         # Volume paths are already accessible as local paths in Databricks
         local_path = file_path.replace("dbfs:", "")
@@ -91,8 +181,11 @@ def process_excel_file(file_info):
         df['data_collection_date'] = file_info['mtime'].date()
         
         # Calculate row hash for each row
-        df['row_hash'] = df.apply(lambda row: calculate_row_hash(row.to_dict()), axis=1)
+        df['row_hash'] = calculate_row_hashes(df)
         
+        df = _set_output_dtypes(df)
+        
+        _write_cache(df, cache_path)
         return df
         
     except Exception as e:
@@ -100,6 +193,42 @@ def process_excel_file(file_info):
         import traceback
         traceback.print_exc()
         return pd.DataFrame()
+
+
+
+def process_files(file_infos, max_workers=None):
+    """
+    Run process_excel_file over many files in parallel, one workbook per process.
+    Returns (file_info, df, error) tuples in the same order as file_infos; a file
+    whose worker failed (e.g. an OOM-killed process breaking the pool) gets
+    df=None and the exception, instead of aborting the whole batch.
+    Workers only get plain file_info dicts; never pass dbutils/Spark objects in.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as ex:
+        futures = [ex.submit(process_excel_file, file_info) for file_info in file_infos]
+        for file_info, future in zip(file_infos, futures):
+            try:
+                results.append((file_info, future.result(), None))
+            except Exception as e:
+                results.append((file_info, None, e))
+    return results
+    
+
+def concat_processed(frames):
+    """
+    Concatenate processed file frames, keeping CATEGORY_COLUMNS categorical.
+    Each file has its own category set and pd.concat falls back to str/object
+    for mismatched categoricals, so every frame first gets the union dtype.
+    """
+    for col in CATEGORY_COLUMNS:
+        categories = set()
+        for df in frames:
+            categories.update(df[col].cat.categories)
+        dtype = pd.CategoricalDtype(sorted(categories))
+        for df in frames:
+            df[col] = df[col].astype(dtype)
+    return pd.concat(frames, ignore_index=True, **CONCAT_KWARGS)
     
     
 def normalize_column_names(df):
@@ -117,18 +246,16 @@ def normalize_column_names(df):
         'ProjectType': 'ProjectType'
     }
     
-    # Rename columns
-    df = df.rename(columns=column_mapping)
-    
-    # Convert column names to lowercase where needed
+    # Convert column names to lowercase where needed; one rename for both steps
     final_columns = {}
     for col in df.columns:
-        if col in ['JobNumber', 'Office', 'ProjectTitle', 'Client', 'Currency', 
-                   'GrossFee', 'GrossFeeEarned', 'GrossFeeYetToBeEarned', 
-                   'Status', 'NewProject', 'StartDate', 'ProjectType']:
-            final_columns[col] = col
+        new_col = column_mapping.get(col, col)
+        if new_col in ['JobNumber', 'Office', 'ProjectTitle', 'Client', 'Currency', 
+                       'GrossFee', 'GrossFeeEarned', 'GrossFeeYetToBeEarned', 
+                       'Status', 'NewProject', 'StartDate', 'ProjectType']:
+            final_columns[col] = new_col
         else:
-            final_columns[col] = col.lower()
+            final_columns[col] = new_col.lower()
     
     df = df.rename(columns=final_columns)
     
@@ -1,5 +1,4 @@
 import re
-import os
 from datetime import datetime
 
 def list_volume_files(dbutils, volume_path, folder, pattern, extensions):
@@ -11,13 +10,16 @@ def list_volume_files(dbutils, volume_path, folder, pattern, extensions):
     try:
         files = dbutils.fs.ls(folder_path)
         
+        # Compile once; extensions are compared without the leading dot
+        pat = re.compile(pattern)
+        exts = {e.lower().lstrip('.') for e in extensions}
+        
         matching_files = []
         for file_info in files:
             filename = file_info.name
-            file_ext = os.path.splitext(filename)[1].lower()
             
             # Check if file matches pattern and has valid extension
-            if re.match(pattern, filename) and file_ext in extensions:
+            if pat.match(filename) and filename.rpartition('.')[2].lower() in exts:
                 matching_files.append({
                     'path': file_info.path,
                     'name': filename,
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+import data_extraction
+
+
+def test_read_file_reads_every_sheet(tmp_path, capsys):
+    # More sheets than SHEET_WORKERS, so sheets are read concurrently
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    n_sheets, n_rows = 8, 500
+    for k in range(n_sheets):
+        ws = wb.create_sheet(f"S{k}")
+        ws.append(["Order Book"])
+        ws.append(["Job Number", "Client", "Currency", "Gross Fee (USD)"])
+        for i in range(n_rows):
+            ws.append([f"J{k}-{i}", "ACME", "USD", "(1,000.50)"])
+    path = tmp_path / "1_Order_Book_Mar_2025.xlsx"
+    wb.save(path)
+
+    df = data_extraction.read_file(str(path))
+
+    assert "Error reading sheet" not in capsys.readouterr().out
+    assert len(df) == n_sheets * n_rows
+    assert list(df.columns) == data_extraction.TARGET_COLUMNS
+    assert df["JobNumber"].tolist()[:2] == ["J0-0", "J0-1"]
+    assert df["JobNumber"].iloc[-1] == f"J{n_sheets - 1}-{n_rows - 1}"
+    assert (df["Gross Fee (USD)"] == -1000.5).all()
+
+
+CSV_HEADER = "Job Number,Client,Currency,Gross Fee (USD)\n"
+CSV_ROWS = "J-1,ACME,USD,\"(1,000.50)\"\n12345,Foo,SGD,\n"
+
+
+@pytest.mark.parametrize("preamble", [
+    "",
+    "Order Book FY25,,,\n,,,\n",  # padded title rows, as Excel exports them
+    "Order Book FY25\n\n",        # short title rows
+])
+def test_read_file_csv(tmp_path, preamble):
+    path = tmp_path / "1_Order_Book_Mar_2025.csv"
+    path.write_text(preamble + CSV_HEADER + CSV_ROWS)
+
+    df = data_extraction.read_file(str(path))
+
+    assert list(df.columns) == data_extraction.TARGET_COLUMNS
+    assert [str(v) for v in df["JobNumber"]] == ["J-1", "12345"]
+    assert df["Client"].tolist() == ["ACME", "Foo"]
+    assert df["Gross Fee (USD)"].iloc[0] == -1000.5
+    assert pd.isna(df["Gross Fee (USD)"].iloc[1])
@@ -0,0 +1,101 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+import data_processing
+
+
+def test_cache_hit_matches_fresh_extraction(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_processing, "CACHE_DIR", str(tmp_path / "cache"))
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Job Number", "Client", "Office", "Currency", "StartDate", "ProjectType"])
+    ws.append([12345, "ACME", "SG", "SGD", datetime.datetime(2025, 1, 2), None])
+    ws.append(["J-2", None, "HK", "HKD", "31/12/2026", None])
+    path = tmp_path / "1_Order_Book_Mar_2025.xlsx"
+    wb.save(path)
+    file_info = {"path": str(path), "name": path.name, "mtime": datetime.datetime(2025, 4, 1)}
+
+    fresh = data_processing.process_excel_file(file_info)
+    cached = data_processing.process_excel_file(file_info)
+
+    assert len(fresh) == 2
+    assert isinstance(fresh["ProjectType"].dtype, pd.CategoricalDtype)
+    assert fresh["JobNumber"].dtype == object
+    assert fresh["JobNumber"].tolist() == ["12345", "J-2"]
+    pd.testing.assert_frame_equal(fresh, cached)
+
+
+def test_cache_keeps_only_latest_entry_per_file(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(data_processing, "CACHE_DIR", str(cache_dir))
+    wb = openpyxl.Workbook()
+    wb.active.append(["Job Number", "Currency"])
+    wb.active.append(["J-1", "USD"])
+    paths = [tmp_path / "1_Order_Book_Mar_2025.xlsx", tmp_path / "1_Order_Book_Apr_2025.xlsx"]
+    for path in paths:
+        wb.save(path)
+
+    for day in (1, 2, 3):
+        for path in paths:
+            data_processing.process_excel_file(
+                {"path": str(path), "name": path.name, "mtime": datetime.datetime(2025, 4, day)})
+
+    # One entry per source file, for the latest mtime
+    entries = sorted(p.name for p in cache_dir.glob("*.parquet"))
+    latest = sorted(
+        os.path.basename(data_processing._cache_path(
+            {"path": str(path), "mtime": datetime.datetime(2025, 4, 3)}))
+        for path in paths)
+    assert entries == latest
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("1_Order_Book_Mar_2025.xlsx", (2025, "Mar", 3)),
+    ("1. Order Book (Jun 2025).xlsm", (2025, "Jun", 6)),
+    ("1_Order_Book_September-2024.xlsx", (2024, "Sep", 9)),
+    ("1_Order_Book_Summary_Jan_2025.xlsx", (2025, "Jan", 1)),
+    ("1_Separate_Feb_2025.xlsx", (2025, "Feb", 2)),
+    ("1_Primary_Book_Oct_2025.xlsx", (2025, "Oct", 10)),
+    ("1_OrderBookMar2025.xlsx", (2025, "Mar", 3)),
+    ("1_Order_Book_2025_Dec.xlsx", (2025, "Dec", 12)),
+    ("1_Order_Book.xlsx", (None, None, None)),
+])
+def test_extract_date_from_filename(filename, expected):
+    assert data_processing.extract_date_from_filename(filename) == expected
+
+
+def _crash_worker(file_info):
+    import os
+    os._exit(1)  # like an OOM-killed worker
+
+
+def test_process_files_records_broken_pool_per_file(monkeypatch):
+    monkeypatch.setattr(data_processing, "process_excel_file", _crash_worker)
+    file_infos = [{"name": "a.xlsx"}, {"name": "b.xlsx"}]
+
+    results = data_processing.process_files(file_infos, max_workers=1)
+
+    assert [info["name"] for info, _, _ in results] == ["a.xlsx", "b.xlsx"]
+    assert all(df is None and error is not None for _, df, error in results)
+
+
+def test_concat_processed_keeps_categories_across_files():
+    frames = []
+    for offices in (["SG", "HK"], ["US"], [None]):
+        df = pd.DataFrame({col: [None] * len(offices) for col in data_processing.TARGET_COLUMNS})
+        df["Office"] = offices
+        for col in data_processing.CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+        frames.append(df)
+
+    combined = data_processing.concat_processed(frames)
+
+    for col in data_processing.CATEGORY_COLUMNS:
+        assert isinstance(combined[col].dtype, pd.CategoricalDtype)
+    assert combined["Office"].tolist()[:3] == ["SG", "HK", "US"]
+    assert combined["Office"].isna().tolist() == [False, False, False, True]